@@ -0,0 +1,68 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Compiled blue reduction kernel for crop_and_convert.py.
+
+Build in place with:
+    python setup.py build_ext --inplace
+"""
+
+cimport cython
+from cython.parallel cimport prange
+from libc.math cimport exp, sin, cos, M_PI
+from openmp cimport omp_set_num_threads
+cimport numpy as np
+
+np.import_array()
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cpdef apply_blue_reduction_c(np.ndarray[np.uint8_t, ndim=3] img, double strength,
+                             double dark_strength, double luminance_threshold=0.35):
+    """Same math as reduce_blue_in_pixel, applied to the blue channel of img in place."""
+    cdef unsigned char[:, :, ::1] view = img
+    cdef Py_ssize_t height = view.shape[0]
+    cdef Py_ssize_t width = view.shape[1]
+    cdef Py_ssize_t y, x
+    cdef double pi = M_PI
+    cdef double exp_denom = exp(3)
+    cdef double r_norm, g_norm, b_norm, luminance, total, shrunk_ratio
+    cdef double reduction_factor, darkness_factor, result, new_b
+
+    with nogil:
+        for y in prange(height, schedule='static'):
+            for x in range(width):
+                r_norm = view[y, x, 0] / 255.0
+                g_norm = view[y, x, 1] / 255.0
+                b_norm = view[y, x, 2] / 255.0
+
+                luminance = 0.299 * r_norm + 0.587 * g_norm + 0.114 * b_norm
+                total = r_norm + g_norm + b_norm + 0.000001
+                shrunk_ratio = b_norm / total * 1.5
+
+                reduction_factor = 1.0
+                if dark_strength > 0 and luminance < luminance_threshold:
+                    darkness_factor = 1 - (luminance / luminance_threshold)
+                    reduction_factor = reduction_factor * (1 - (dark_strength * darkness_factor * 0.1))
+
+                if strength > 0:
+                    # exp(3x) * exp(3 - 3x) == exp(3), so the first term is constant
+                    result = ((1.0/4) * (-4*pi*pi*exp_denom + (6*pi*sin(2 * pi * shrunk_ratio)
+                              - 9*cos(2 * pi * shrunk_ratio) + 9 + 4*pi*pi) *
+                              exp(3 - 3*shrunk_ratio)) / (pi*pi * (1 - exp_denom)) - 1) * strength + 1
+                    reduction_factor = reduction_factor * result
+
+                new_b = b_norm * reduction_factor * 255
+                if new_b < 0:
+                    new_b = 0
+                elif new_b > 255:
+                    new_b = 255
+                view[y, x, 2] = <unsigned char>new_b
+
+    return img
+
+
+def set_num_threads(int num_threads):
+    """Set the number of OpenMP threads used by apply_blue_reduction_c."""
+    omp_set_num_threads(num_threads)
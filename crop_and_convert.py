@@ -3,11 +3,45 @@
 import sys
 import os
 import argparse
+import functools
+import importlib
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from PIL import Image, ImageEnhance, ImageOps
+from PIL import Image, ImageOps
 import math
 
-def reduce_blue_in_pixel(r, g, b, strength, dark_strength=0, luminance_threshold=0.35):
+try:
+    # Optional Cython kernel, built with: python setup.py build_ext --inplace
+    from blue_reduce import apply_blue_reduction_c, set_num_threads as set_omp_num_threads
+except ImportError:
+    apply_blue_reduction_c = None
+    set_omp_num_threads = None
+
+# Constants of the blue reduction curve, hoisted out of the per-pixel math
+_PI = math.pi
+_PI2 = _PI * _PI
+_EXP3 = math.exp(3.0)
+_INV_DENOM = 1.0 / (_PI2 * (1.0 - _EXP3))
+
+PALETTE_PATH = 'palette_7color.gif'
+
+# Luminance (0-1) below which pixels get the additional dark blue reduction
+LUMINANCE_THRESHOLD = 0.35
+
+@functools.lru_cache(maxsize=None)
+def _optional_module(name):
+    """
+    Import an optional dependency on first use, None if it is not installed.
+    
+    Numba, OpenCV and CuPy take longer to import than the rest of the script,
+    so only the paths that use them pay for it.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+def reduce_blue_in_pixel(r, g, b, strength, dark_strength=0, luminance_threshold=LUMINANCE_THRESHOLD):
     """
     Reduce blue in a pixel based on blue dominance and darkness.
     
@@ -16,9 +50,12 @@ def reduce_blue_in_pixel(r, g, b, strength, dark_strength=0, luminance_threshold
         strength: Blue reduction strength for non-blue-dominant pixels
         dark_strength: Additional blue reduction strength for dark pixels
         luminance_threshold: Threshold below which pixels are considered dark
+    
+    Returns:
+        The new blue value, red and green are never changed
     """
     if strength == 0 and dark_strength == 0:
-        return r, g, b
+        return b
     
     # Normalize to 0-1 range
     r_norm, g_norm, b_norm = r/255.0, g/255.0, b/255.0
@@ -43,85 +80,217 @@ def reduce_blue_in_pixel(r, g, b, strength, dark_strength=0, luminance_threshold
     # Original blue reduction based on dominance
     if strength > 0:
         # Same formula as in the shell script
-        pi = math.pi
-        exp_term = math.exp(3 * shrunk_ratio)
-        sin_term = math.sin(2 * pi * shrunk_ratio)
-        cos_term = math.cos(2 * pi * shrunk_ratio)
-        exp_denom = math.exp(3)
-
-        result = ((1/4) * (-4*pi**2*exp_term + 6*pi*sin_term - 9*cos_term + 9 + 4*pi**2) *
-                 math.exp(3 - 3*shrunk_ratio) / (pi**2 * (1 - exp_denom)) - 1) * strength + 1
+        # exp(3x) * exp(3 - 3x) == exp(3), so the first term is constant
+        sin_term = math.sin(2 * _PI * shrunk_ratio)
+        cos_term = math.cos(2 * _PI * shrunk_ratio)
+        num = -4*_PI2*_EXP3 + (6*_PI*sin_term - 9*cos_term + 9 + 4*_PI2) * math.exp(3 - 3*shrunk_ratio)
+
+        result = (0.25 * num * _INV_DENOM - 1) * strength + 1
         reduction_factor *= result
     
     # Apply reduction and clamp
     new_b = max(0, min(255, b_norm * reduction_factor * 255))
     
-    return r, g, int(new_b)
+    return int(new_b)
 
-def apply_blue_reduction(image, strength, dark_strength=0):
-    """Apply blue reduction to the entire image."""
-    if strength == 0 and dark_strength == 0:
-        return image
+@functools.lru_cache(maxsize=None)
+def _blue_reduce_nb():
+    """Numba kernel of the reduce_blue_in_pixel loop, None without Numba."""
+    global _reduce_blue_in_pixel_nb
+    if _optional_module('numba') is None:
+        return None
+    from numba import njit, prange
+    # A global, not a closure variable: Numba's cache misses on closures over
+    # compiled functions and would recompile the kernel on every run
+    _reduce_blue_in_pixel_nb = njit(fastmath=True, cache=True)(reduce_blue_in_pixel)
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def kernel(img_array, strength, dark_strength, luminance_threshold):
+        """Compiled reduce_blue_in_pixel loop, updates the blue channel in place."""
+        for y in prange(img_array.shape[0]):
+            for x in range(img_array.shape[1]):
+                img_array[y, x, 2] = _reduce_blue_in_pixel_nb(img_array[y, x, 0], img_array[y, x, 1],
+                                                              img_array[y, x, 2], strength, dark_strength,
+                                                              luminance_threshold)
+    
+    return kernel
+
+def _blue_reduction_factor(luminance, blue_ratio, strength, dark_strength, luminance_threshold):
+    """Vectorized reduction factor of reduce_blue_in_pixel, luminance and blue_ratio are 0-1 arrays."""
+    reduction_factor = np.ones_like(blue_ratio)
     
-    # Convert to RGB if not already
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
+    # Additional reduction for dark pixels
+    if dark_strength > 0:
+        darkness_factor = 1 - (luminance / luminance_threshold)
+        additional_reduction = 1 - (dark_strength * darkness_factor * 0.1)  # Scale down the effect
+        reduction_factor *= np.where(luminance < luminance_threshold, additional_reduction, 1.0)
+    
+    # Original blue reduction based on dominance
+    if strength > 0:
+        # Same formula as in the shell script
+        shrunk_ratio = blue_ratio * 1.5  # 1.5 to shorten the curve
+        sin_term = np.sin(2 * _PI * shrunk_ratio)
+        cos_term = np.cos(2 * _PI * shrunk_ratio)
+        num = -4*_PI2*_EXP3 + (6*_PI*sin_term - 9*cos_term + 9 + 4*_PI2) * np.exp(3 - 3*shrunk_ratio)
+
+        reduction_factor *= (0.25 * num * _INV_DENOM - 1) * strength + 1
     
-    # Convert to numpy array for faster processing
-    img_array = np.array(image)
+    return reduction_factor
+
+# Number of samples in the blue reduction lookup tables
+BLUE_LUT_SIZE = 1024
+
+def blue_reduction_luts(strength, dark_strength=0, luminance_threshold=LUMINANCE_THRESHOLD, size=BLUE_LUT_SIZE):
+    """
+    Tabulate the blue reduction multipliers of reduce_blue_in_pixel.
     
-    # Apply blue reduction pixel by pixel
-    for y in range(img_array.shape[0]):
-        for x in range(img_array.shape[1]):
-            r, g, b = img_array[y, x]
-            new_r, new_g, new_b = reduce_blue_in_pixel(r, g, b, strength, dark_strength)
-            img_array[y, x] = [new_r, new_g, new_b]
+    Returns:
+        (blue_curve, dark_curve): float32 tables of `size` entries, indexed by
+        the blue ratio and the luminance (both 0-1) respectively.
+    """
+    axis = np.linspace(0, 1, size)
+    # Each curve on its own, with the other strength set to 0
+    blue_curve = _blue_reduction_factor(axis, axis, strength, 0, luminance_threshold)
+    dark_curve = _blue_reduction_factor(axis, axis, 0, dark_strength, luminance_threshold)
     
-    return Image.fromarray(img_array)
+    return blue_curve.astype(np.float32), dark_curve.astype(np.float32)
+
+def apply_blue_reduction(img_array, strength, dark_strength=0, luminance_threshold=LUMINANCE_THRESHOLD, luts=None):
+    """
+    Apply blue reduction to the entire image.
+
+    When luts are given, the curve is looked up in them instead of being
+    evaluated for every pixel. Otherwise the exact curve is evaluated with
+    the compiled per-pixel kernel from the blue_reduce extension or Numba
+    when available, and with NumPy if neither is.
 
-def apply_adjustments(image, saturation=100, black_level=0, contrast=1, shadows=0):
-    """Apply various image adjustments."""
+    Args:
+        img_array: Writable, contiguous uint8 RGB array, its blue channel is updated in place
+        luts: Tables from blue_reduction_luts for the same parameters
+    """
+    if strength == 0 and dark_strength == 0:
+        return img_array
+    
+    if luts is None and apply_blue_reduction_c is not None:
+        return apply_blue_reduction_c(img_array, strength, dark_strength, luminance_threshold)
+    
+    if luts is None and _blue_reduce_nb() is not None:
+        _blue_reduce_nb()(img_array, float(strength), float(dark_strength), float(luminance_threshold))
+        return img_array
+    
+    # Normalize to 0-1 range
+    arr = img_array.astype(np.float32) / 255.0
+    r, g, b = arr[..., 0], arr[..., 1], arr[..., 2]
+    
+    # Calculate luminance (perceived brightness)
+    luminance = 0.299 * r + 0.587 * g + 0.114 * b
+    # Reciprocal then multiply, reusing the sum's buffer for the ratio
+    blue_ratio = r + g + b + np.float32(0.000001)
+    np.reciprocal(blue_ratio, out=blue_ratio)
+    blue_ratio *= b
+    
+    if luts is None:
+        reduction_factor = _blue_reduction_factor(luminance, blue_ratio, strength, dark_strength,
+                                                  luminance_threshold)
+    else:
+        # Quantize luminance and blue ratio to table indices
+        blue_curve, dark_curve = luts
+        last = len(blue_curve) - 1
+        lum_idx = np.rint(luminance * last).astype(np.intp)
+        ratio_idx = np.rint(blue_ratio * last).astype(np.intp)
+        reduction_factor = np.take(blue_curve, ratio_idx) * np.take(dark_curve, lum_idx)
     
-    # Saturation
-    if saturation != 100:
-        enhancer = ImageEnhance.Color(image)
-        image = enhancer.enhance(saturation / 100.0)
+    # Apply reduction and clamp
+    img_array[..., 2] = np.clip(b * reduction_factor * 255, 0, 255).astype(np.uint8)
+    
+    return img_array
+
+def _gray(img_array):
+    """Luminance computed like PIL's convert('L'), in 16-bit fixed point."""
+    rgb = img_array.astype(np.uint32)
+    gray = (rgb[:,:,0] * 19595 + rgb[:,:,1] * 38470 + rgb[:,:,2] * 7471 + 0x8000) >> 16
+    return gray.astype(np.float32)
+
+def apply_adjustments(img_array, saturation=100, black_level=0, contrast=1, shadows=0):
+    """
+    Apply various image adjustments.
+
+    Works on a uint8 RGB array (NumPy or CuPy) and returns a uint8 RGB array.
+    Saturation and contrast are blends like PIL's ImageEnhance.Color and
+    ImageEnhance.Contrast. Both are affine, so they are folded into a single
+    pass with one clip at the end. The black level is added before that pass,
+    clipping highlights at 255 like the separate steps did.
+    """
     
     # Black level adjustment (similar to +level in ImageMagick)
     if black_level > 0:
-        # This raises the black point
-        img_array = np.array(image)
-        img_array = np.clip(img_array + (black_level * 255 / 100), 0, 255).astype(np.uint8)
-        image = Image.fromarray(img_array)
-    
-    # Contrast adjustment (simplified version of sigmoidal contrast)
-    if contrast != 0:
+        if saturation != 100:
+            # Saturated channels clip before the black level is added, which
+            # is not affine, so saturation gets its own pass in this case
+            img_array = apply_adjustments(img_array, saturation, contrast=0)
+            saturation = 100
+        
+        # This raises the black point, highlights clip at 255
+        offset = min(255, int(black_level * 255 / 100))
+        img_array = np.minimum(img_array, 255 - offset) + np.uint8(offset)
+    
+    if saturation != 100 or contrast != 0:
+        # Saturation (blend with the grayscale image)
+        saturation_factor = saturation / 100.0
+        gray = _gray(img_array)[..., None]
+        
+        # Contrast adjustment (simplified version of sigmoidal contrast)
         if contrast > 0:
             # Increase contrast
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(1 + contrast * 0.2)
-        else:
+            contrast_factor = 1 + contrast * 0.2
+        elif contrast < 0:
             # Decrease contrast
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(1 + contrast * 0.1)
+            contrast_factor = 1 + contrast * 0.1
+        else:
+            contrast_factor = 1
+        # Blend with the mean gray level, saturation keeps the gray level of every pixel
+        mean = int(gray.mean() + 0.5) if contrast != 0 else 0
+        
+        # ((img - gray) * saturation + gray - mean) * contrast + mean
+        img_f = img_array.astype(np.float32)
+        img_f -= gray
+        img_f *= np.float32(saturation_factor * contrast_factor)
+        img_f += (gray - np.float32(mean)) * np.float32(contrast_factor) + np.float32(mean)
+        img_array = np.clip(img_f, 0, 255).astype(np.uint8)
     
     # Shadow brightening (simplified)
     if shadows > 0:
-        img_array = np.array(image).astype(float)
+        # float32 throughout, float64 would double the memory traffic
+        img_array = img_array.astype(np.float32)
         # Brighten darker areas more than lighter areas
-        luminance = 0.299 * img_array[:,:,0] + 0.587 * img_array[:,:,1] + 0.114 * img_array[:,:,2]
-        shadow_mask = (255 - luminance) / 255  # Invert so dark areas have higher values
+        luminance = (np.float32(0.299) * img_array[:,:,0] + np.float32(0.587) * img_array[:,:,1] +
+                     np.float32(0.114) * img_array[:,:,2])
+        shadow_mask = (np.float32(255) - luminance) / np.float32(255)  # Invert so dark areas have higher values
         
-        for channel in range(3):
-            adjustment = shadow_mask * shadows * 5  # Scale the effect
-            img_array[:,:,channel] = np.clip(img_array[:,:,channel] + adjustment, 0, 255)
-        
-        image = Image.fromarray(img_array.astype(np.uint8))
+        # Same adjustment for every channel, broadcast over the last axis
+        adjustment = (shadow_mask * np.float32(shadows * 5.0))[..., None]  # Scale the effect
+        img_array = np.clip(img_array + adjustment, 0, 255).astype(np.uint8)
     
-    return image
+    return img_array
+
+def apply_pipeline(img_array, args, blue_luts=None):
+    """
+    Apply blue reduction and the other adjustments from the parsed arguments.
+
+    Takes and returns a uint8 RGB array so the image stays in NumPy between steps.
+    blue_luts are optional precomputed blue reduction tables for the arguments.
+    """
+    img_array = apply_blue_reduction(np.ascontiguousarray(img_array), args.blue_reduction,
+                                     args.dark_blue_reduction, luts=blue_luts)
+    return apply_adjustments(img_array, args.saturation, args.black_level, args.contrast, args.shadows)
 
 def crop_to_ratio(image, ratio_str):
-    """Crop image to specified ratio."""
+    """
+    Find the centered crop of image with the specified ratio.
+    
+    Returns the (left, top, right, bottom) box instead of cropping, so the
+    crop can be folded into the resize.
+    """
     width, height = image.size
     ratio_parts = ratio_str.split(':')
     target_ratio = float(ratio_parts[0]) / float(ratio_parts[1])
@@ -132,19 +301,122 @@ def crop_to_ratio(image, ratio_str):
         # Too wide, crop width
         new_width = int(height * target_ratio)
         left = (width - new_width) // 2
-        image = image.crop((left, 0, left + new_width, height))
+        return (left, 0, left + new_width, height)
     else:
         # Too tall, crop height
         new_height = int(width / target_ratio)
         top = (height - new_height) // 2
-        image = image.crop((0, top, width, top + new_height))
-    
-    return image
+        return (0, top, width, top + new_height)
 
-def simple_dither(image, palette_path, method='floyd'):
-    """Apply dithering using PIL's built-in methods."""
-    # Load the palette
+@functools.lru_cache(maxsize=4)
+def _load_palette(palette_path):
+    """Open and decode the palette image once, reused by later calls."""
     palette_img = Image.open(palette_path)
+    palette_img.load()
+    return palette_img
+
+@functools.lru_cache(maxsize=4)
+def _palette_colors(palette_path):
+    """Distinct RGB colors of the palette image as a float32 (N, 3) array."""
+    colors = np.asarray(_load_palette(palette_path).convert('RGB')).reshape(-1, 3)
+    return np.unique(colors, axis=0).astype(np.float32)
+
+@functools.lru_cache(maxsize=None)
+def _fs_dither_nb():
+    """Numba Floyd-Steinberg kernel, None without Numba."""
+    if _optional_module('numba') is None:
+        return None
+    from numba import njit
+    
+    @njit(fastmath=True, cache=True)
+    def kernel(img, palette, diffuse):
+        """
+        Serpentine Floyd-Steinberg dither of a float32 RGB array onto palette.
+        
+        img is used as the error buffer and is modified. Returns the palette
+        index of every pixel.
+        """
+        height, width = img.shape[0], img.shape[1]
+        indices = np.empty((height, width), dtype=np.uint8)
+        w7, w3 = np.float32(7 / 16), np.float32(3 / 16)
+        w5, w1 = np.float32(5 / 16), np.float32(1 / 16)
+        for y in range(height):
+            next_row = y + 1 < height
+            # Alternate the scan direction to avoid directional artifacts
+            step = 1 if y % 2 == 0 else -1
+            x = 0 if step == 1 else width - 1
+            for _ in range(width):
+                r, g, b = img[y, x, 0], img[y, x, 1], img[y, x, 2]
+                
+                # Nearest palette entry
+                best = 0
+                best_dist = np.float32(np.inf)
+                for i in range(palette.shape[0]):
+                    dr = r - palette[i, 0]
+                    dg = g - palette[i, 1]
+                    db = b - palette[i, 2]
+                    dist = dr * dr + dg * dg + db * db
+                    if dist < best_dist:
+                        best_dist = dist
+                        best = i
+                indices[y, x] = best
+                
+                if diffuse:
+                    # Distribute the error 7/16 ahead, 3/16, 5/16, 1/16 on the next row
+                    err_r = r - palette[best, 0]
+                    err_g = g - palette[best, 1]
+                    err_b = b - palette[best, 2]
+                    ahead = x + step
+                    behind = x - step
+                    has_ahead = 0 <= ahead < width
+                    if has_ahead:
+                        img[y, ahead, 0] += err_r * w7
+                        img[y, ahead, 1] += err_g * w7
+                        img[y, ahead, 2] += err_b * w7
+                    if next_row:
+                        if 0 <= behind < width:
+                            img[y + 1, behind, 0] += err_r * w3
+                            img[y + 1, behind, 1] += err_g * w3
+                            img[y + 1, behind, 2] += err_b * w3
+                        img[y + 1, x, 0] += err_r * w5
+                        img[y + 1, x, 1] += err_g * w5
+                        img[y + 1, x, 2] += err_b * w5
+                        if has_ahead:
+                            img[y + 1, ahead, 0] += err_r * w1
+                            img[y + 1, ahead, 1] += err_g * w1
+                            img[y + 1, ahead, 2] += err_b * w1
+                x += step
+        return indices
+    
+    return kernel
+
+def srgb_to_linear(values):
+    """Convert sRGB values (0-255) to linear light (0-1) with the sRGB transfer curve."""
+    values = values.astype(np.float32) / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4).astype(np.float32)
+
+def simple_dither(image, palette_path, method='floyd', linear=False):
+    """
+    Apply dithering of an RGB image to the palette colors.
+    
+    Uses PIL's built-in methods, or the Numba kernel in linear light.
+    
+    Args:
+        linear: Match colors and diffuse the error in linear light instead of
+            sRGB, which keeps the brightness of gradients (needs Numba)
+    """
+    if linear and _fs_dither_nb() is not None:
+        palette = _palette_colors(palette_path)
+        img = srgb_to_linear(np.asarray(image))
+        indices = _fs_dither_nb()(img, srgb_to_linear(palette), method.lower() != 'none')
+        # Indices map straight back to the sRGB palette colors
+        return Image.fromarray(palette.astype(np.uint8)[indices])
+    
+    if linear:
+        print("Warning: Linear dithering needs numba. Dithering in sRGB instead.")
+    
+    # Load the palette
+    palette_img = _load_palette(palette_path)
     
     # Convert image to P mode with the palette
     if method.lower() == 'none':
@@ -157,9 +429,221 @@ def simple_dither(image, palette_path, method='floyd'):
     # Convert back to RGB
     return quantized.convert('RGB')
 
+def converted_path(image_path):
+    """Output path of an image in the converted directory."""
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join('converted', f'{base_name}_converted.bmp')
+
+def resize(image, size, box):
+    """
+    Crop an RGB PIL image to box and resize it to size (width, height).
+    
+    Returns a uint8 RGB array. Shrinking uses OpenCV's area filter on a view
+    of the crop when OpenCV is installed. np.asarray copies the whole source
+    image once for that, and the resize is still about twice as fast as
+    PIL's Lanczos. Otherwise, and when enlarging, PIL's Lanczos filter reads
+    the crop in place through its box argument.
+    """
+    left, top, right, bottom = box
+    cv2 = _optional_module('cv2') if size[0] < right - left and size[1] < bottom - top else None
+    if cv2 is not None:
+        return cv2.resize(np.asarray(image)[top:bottom, left:right], size, interpolation=cv2.INTER_AREA)
+    
+    return np.array(image.resize(size, Image.LANCZOS, box=box))
+
+def load_resized(image_path):
+    """
+    Load an image, crop it to the display ratio and scale it to the display size.
+    
+    Returns a uint8 RGB array.
+    """
+    # Decode once and convert to RGB here, so later steps never convert
+    image = Image.open(image_path)
+    image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    print(f"Original dimensions: {image.size}")
+    
+    # Determine orientation and crop
+    width, height = image.size
+    if width > height:
+        # Landscape
+        crop_ratio = "5:3"
+        final_dimensions = (800, 480)
+        orientation = "landscape"
+    else:
+        # Portrait
+        crop_ratio = "3:5"
+        final_dimensions = (480, 800)
+        orientation = "portrait"
+    
+    print(f"Detected {orientation} orientation, cropping to {crop_ratio} and scaling to {final_dimensions}")
+    
+    # Process image
+    return resize(image, final_dimensions, crop_to_ratio(image, crop_ratio))
+
+# numba.cuda once a CUDA kernel factory has run. The kernels use it as a
+# global, which is how Numba (and its CUDA simulator) resolves it
+cuda = None
+
+@functools.lru_cache(maxsize=None)
+def _blue_reduce_cuda():
+    """CUDA kernel of reduce_blue_in_pixel, needs Numba CUDA."""
+    global cuda
+    from numba import cuda
+    reduce_blue_in_pixel_cuda = cuda.jit(device=True)(reduce_blue_in_pixel)
+
+    @cuda.jit
+    def kernel(img_array, strength, dark_strength, luminance_threshold):
+        """reduce_blue_in_pixel with one thread per pixel, updates the blue channel in place."""
+        y, x = cuda.grid(2)
+        if y >= img_array.shape[0] or x >= img_array.shape[1]:
+            return
+        
+        img_array[y, x, 2] = reduce_blue_in_pixel_cuda(img_array[y, x, 0], img_array[y, x, 1],
+                                                       img_array[y, x, 2], strength, dark_strength,
+                                                       luminance_threshold)
+    
+    return kernel
+
+@functools.lru_cache(maxsize=4)
+def _fs_dither_cuda(palette_path, linear):
+    """
+    Build a Floyd-Steinberg kernel with the palette in constant memory.
+    
+    Launched as a single block, one thread per row. Pixel (x, y) only
+    depends on pixels with a smaller x + 2y, so rows advance as a skewed
+    wavefront with a barrier per step. This needs a fixed left-to-right
+    scan, so unlike _fs_dither_nb it is not serpentine.
+    """
+    global cuda
+    from numba import cuda
+    palette_colors = _palette_colors(palette_path)
+    if linear:
+        palette_colors = srgb_to_linear(palette_colors)
+    
+    @cuda.jit
+    def kernel(img, indices, diffuse):
+        palette = cuda.const.array_like(palette_colors)
+        height, width = img.shape[0], img.shape[1]
+        for step in range(width + 2 * (height - 1)):
+            for y in range(cuda.threadIdx.x, height, cuda.blockDim.x):
+                x = step - 2 * y
+                if x < 0 or x >= width:
+                    continue
+                
+                # Nearest palette entry
+                best = 0
+                best_dist = math.inf
+                for i in range(palette.shape[0]):
+                    dr = img[y, x, 0] - palette[i, 0]
+                    dg = img[y, x, 1] - palette[i, 1]
+                    db = img[y, x, 2] - palette[i, 2]
+                    dist = dr * dr + dg * dg + db * db
+                    if dist < best_dist:
+                        best_dist = dist
+                        best = i
+                indices[y, x] = best
+                
+                if not diffuse:
+                    continue
+                
+                # Neighbouring rows update the same pixels in one step, hence atomics
+                for c in range(3):
+                    err = img[y, x, c] - palette[best, c]
+                    if x + 1 < width:
+                        cuda.atomic.add(img, (y, x + 1, c), err * (7 / 16))
+                    if y + 1 < height:
+                        if x > 0:
+                            cuda.atomic.add(img, (y + 1, x - 1, c), err * (3 / 16))
+                        cuda.atomic.add(img, (y + 1, x, c), err * (5 / 16))
+                        if x + 1 < width:
+                            cuda.atomic.add(img, (y + 1, x + 1, c), err * (1 / 16))
+            cuda.syncthreads()
+    
+    return kernel
+
+def cuda_available():
+    """Whether the --gpu path can run (CuPy, Numba CUDA and a device)."""
+    if _optional_module('cupy') is None:
+        return False
+    numba_cuda = _optional_module('numba.cuda')
+    return numba_cuda is not None and numba_cuda.is_available()
+
+def process_batch_cuda(image_paths, args):
+    """
+    Convert several images on the GPU.
+    
+    Cropping and resizing happen on the host, then each image is copied to
+    the device once and blue reduction, adjustments and dithering run there.
+    """
+    cp = _optional_module('cupy')
+    dither = os.path.exists(PALETTE_PATH)
+    linear = args.dither_space == 'Linear'
+    
+    for image_path in image_paths:
+        output_path = converted_path(image_path)
+        print(f"Processing '{image_path}' -> '{output_path}' on GPU")
+        d_img = cp.asarray(load_resized(image_path))
+        if args.blue_reduction != 0 or args.dark_blue_reduction != 0:
+            threads = (16, 16)
+            blocks = ((d_img.shape[0] + 15) // 16, (d_img.shape[1] + 15) // 16)
+            _blue_reduce_cuda()[blocks, threads](d_img, float(args.blue_reduction),
+                                                 float(args.dark_blue_reduction), LUMINANCE_THRESHOLD)
+        d_img = apply_adjustments(d_img, args.saturation, args.black_level, args.contrast, args.shadows)
+        
+        if dither:
+            palette = _palette_colors(PALETTE_PATH)
+            d_work = srgb_to_linear(d_img) if linear else d_img.astype(cp.float32)
+            d_indices = cp.empty(d_img.shape[:2], dtype=cp.uint8)
+            threads = min(1024, d_img.shape[0])
+            _fs_dither_cuda(PALETTE_PATH, linear)[1, threads](d_work, d_indices,
+                                                             args.dither_method.lower() != 'none')
+            img_array = palette.astype(np.uint8)[cp.asnumpy(d_indices)]
+        else:
+            img_array = cp.asnumpy(d_img)
+        
+        Image.fromarray(img_array).save(output_path, 'BMP')
+
+def process_one(image_path, args, blue_luts=None):
+    """Convert a single image on the CPU and save it to the converted directory."""
+    # Generate output path
+    output_path = converted_path(image_path)
+    print(f"Processing '{image_path}' -> '{output_path}'")
+    
+    img_array = load_resized(image_path)
+    
+    # Apply blue reduction and other adjustments
+    img_array = apply_pipeline(img_array, args, blue_luts)
+    image = Image.fromarray(img_array)
+    
+    # Apply dithering if the palette exists
+    if os.path.exists(PALETTE_PATH):
+        image = simple_dither(image, PALETTE_PATH, args.dither_method, args.dither_space == 'Linear')
+    
+    # Save result
+    image.save(output_path, 'BMP')
+
+def _init_worker(exact_blue_curve):
+    """
+    Limit each batch worker to one native thread.
+    
+    The workers already run in parallel, so the parallel Numba and OpenMP
+    blue reduction kernels would otherwise start cpu_count threads in every
+    process. They only run for the exact curve, otherwise nothing is set,
+    as setting Numba's thread count starts its threading layer.
+    """
+    if not exact_blue_curve:
+        return
+    numba = _optional_module('numba')
+    if set_omp_num_threads is not None:
+        set_omp_num_threads(1)
+    elif numba is not None:
+        numba.set_num_threads(1)
+
 def main():
     parser = argparse.ArgumentParser(description='Process images for 7-color e-ink display')
-    parser.add_argument('image_path', help='Path to input image')
+    parser.add_argument('image_paths', nargs='+', help='Paths to input images')
     parser.add_argument('--diffusion', type=int, default=85, help='Dither diffusion amount (not used in PIL version)')
     parser.add_argument('--blue-reduction', type=float, default=0, help='Blue reduction strength')
     parser.add_argument('--dark-blue-reduction', type=float, default=0, help='Additional blue reduction for dark pixels')
@@ -169,64 +653,62 @@ def main():
     parser.add_argument('--shadows', type=float, default=0, help='Shadow brightening strength')
     parser.add_argument('--dither-method', default='FloydSteinberg', choices=['FloydSteinberg', 'None'], 
                        help='Dither method')
+    parser.add_argument('--dither-space', default='sRGB', choices=['sRGB', 'Linear'],
+                       help='Color space for palette matching and error diffusion')
+    parser.add_argument('--blue-curve', default='Table', choices=['Table', 'Exact'],
+                       help='Look the blue reduction curve up in a table built once per run, or evaluate '
+                            'it exactly per pixel (with Cython or Numba when available, NumPy otherwise)')
+    parser.add_argument('--gpu', action='store_true', help='Process on a CUDA GPU (needs CuPy)')
     
     args = parser.parse_args()
     
-    if not os.path.exists(args.image_path):
-        print(f"Error: Image file '{args.image_path}' not found.")
+    missing = [path for path in args.image_paths if not os.path.exists(path)]
+    for path in missing:
+        print(f"Error: Image file '{path}' not found.")
+    if missing:
+        sys.exit(1)
+    
+    # Outputs only keep the base name, so different inputs can collide
+    outputs = {}
+    for path in args.image_paths:
+        outputs.setdefault(converted_path(path), []).append(path)
+    duplicates = {output: paths for output, paths in outputs.items() if len(paths) > 1}
+    for output, paths in duplicates.items():
+        print(f"Error: {', '.join(repr(path) for path in paths)} would all be written to '{output}'.")
+    if duplicates:
         sys.exit(1)
     
     # Create output directory
     os.makedirs('converted', exist_ok=True)
     
-    # Generate output path
-    base_name = os.path.splitext(os.path.basename(args.image_path))[0]
-    output_path = os.path.join('converted', f'{base_name}_converted.bmp')
-    
-    print(f"Processing '{args.image_path}' -> '{output_path}'")
     print(f"Settings: Blue Reduction: {args.blue_reduction}, Dark Blue Reduction: {args.dark_blue_reduction}, "
           f"Saturation: {args.saturation}%, Black Level: {args.black_level}%, "
           f"Contrast: {args.contrast}, Shadows: {args.shadows}")
     
-    # Load image
-    image = Image.open(args.image_path)
-    print(f"Original dimensions: {image.size}")
+    if not os.path.exists(PALETTE_PATH):
+        print(f"Warning: Palette file '{PALETTE_PATH}' not found. Skipping dithering.")
     
-    # Determine orientation and crop
-    width, height = image.size
-    if width > height:
-        # Landscape
-        crop_ratio = "5:3"
-        final_dimensions = (800, 480)
-        orientation = "landscape"
-    else:
-        # Portrait
-        crop_ratio = "3:5"
-        final_dimensions = (480, 800)
-        orientation = "portrait"
+    if args.gpu and not cuda_available():
+        print("Warning: --gpu needs CuPy and a CUDA device. Processing on CPU instead.")
+        args.gpu = False
     
-    print(f"Detected {orientation} orientation, cropping to {crop_ratio} and scaling to {final_dimensions}")
-    
-    # Process image
-    image = crop_to_ratio(image, crop_ratio)
-    image = image.resize(final_dimensions, Image.LANCZOS)
+    # The blue reduction curve is fixed for the run, tabulate it once here
+    # so no image evaluates it per pixel
+    blue_luts = None
+    if args.blue_curve == 'Table':
+        blue_luts = blue_reduction_luts(args.blue_reduction, args.dark_blue_reduction)
     
-    # Apply blue reduction
-    image = apply_blue_reduction(image, args.blue_reduction, args.dark_blue_reduction)
-    
-    # Apply other adjustments
-    image = apply_adjustments(image, args.saturation, args.black_level, args.contrast, args.shadows)
-    
-    # Check if palette exists
-    palette_path = 'palette_7color.gif'
-    if os.path.exists(palette_path):
-        # Apply dithering
-        image = simple_dither(image, palette_path, args.dither_method)
+    if args.gpu:
+        process_batch_cuda(args.image_paths, args)
+    elif len(args.image_paths) == 1:
+        process_one(args.image_paths[0], args, blue_luts)
     else:
-        print(f"Warning: Palette file '{palette_path}' not found. Skipping dithering.")
+        # Images are independent, convert them in parallel processes
+        exact_blue_curve = blue_luts is None and (args.blue_reduction != 0 or args.dark_blue_reduction != 0)
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_worker,
+                                 initargs=(exact_blue_curve,)) as executor:
+            list(executor.map(functools.partial(process_one, args=args, blue_luts=blue_luts), args.image_paths))
     
-    # Save result
-    image.save(output_path, 'BMP')
     print("Done.")
 
 if __name__ == '__main__':
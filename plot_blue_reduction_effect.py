@@ -35,7 +35,13 @@ def plot_curves(strengths):
 
         def clone_norm(x,k_val):
             x=x*1.5 # 1.5 to shorten the curve
-            return ((1/4)*(-4*np.pi**2*np.exp(3*x) + 6*np.pi*np.sin(2*np.pi*x) - 9*np.cos(2*np.pi*x) + 9 + 4*np.pi**2)*np.exp(3 - 3*x)/(np.pi**2*(1 - np.exp(3))) - 1)*k_val+1
+            # exp(3x) * exp(3 - 3x) == exp(3), so the first term is constant
+            pi2 = np.pi*np.pi
+            ex = np.exp(3 - 3*x)
+            s = np.sin(2*np.pi*x)
+            c = np.cos(2*np.pi*x)
+            num = -4*pi2*np.exp(3.0) + (6*np.pi*s - 9*c + 9 + 4*pi2)*ex
+            return (0.25*num/(pi2*(1 - np.exp(3.0))) - 1)*k_val+1
 
 
         #plt.plot(blue_ratio, f(blue_ratio,k), label=f'Strength = {strength}')
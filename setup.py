@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Builds the optional blue_reduce extension: python setup.py build_ext --inplace"""
+
+import numpy as np
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+
+extensions = [
+    Extension(
+        'blue_reduce',
+        ['blue_reduce.pyx'],
+        include_dirs=[np.get_include()],
+        define_macros=[('NPY_NO_DEPRECATED_API', 'NPY_1_7_API_VERSION')],
+        extra_compile_args=['-O3', '-march=native', '-ffast-math', '-fopenmp'],
+        extra_link_args=['-fopenmp'],
+    )
+]
+
+setup(
+    name='blue_reduce',
+    ext_modules=cythonize(extensions),
+)